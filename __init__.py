@@ -4,11 +4,37 @@ from .draft_v2 import Draftable
 from .draft_v2 import Instantiate
 from .draft_v2 import is_draft
 from .draft_v2 import is_subdraft
+from .draft_v2 import get_draft
+from .draft_v2 import get_instancename
+from .draft_v2 import memory_report
+from .draft_v2 import trace_allocations
+from .draft_v2 import build_costs
+from .draft_v2 import save_build_costs
+from .draft_v2 import load_build_costs
+from .schedule import build_all
+from .export import export_drafts
+from .export import load_drafts
+from .plan import compile_plan
+from .plan import load_plan
+from .plan import cached_plan
 
 __all__ = [
     'Draft',
     'Draftable',
     'Instantiate',
     'is_draft',
-    'is_subdraft'
+    'is_subdraft',
+    'get_draft',
+    'get_instancename',
+    'memory_report',
+    'trace_allocations',
+    'build_costs',
+    'save_build_costs',
+    'load_build_costs',
+    'build_all',
+    'export_drafts',
+    'load_drafts',
+    'compile_plan',
+    'load_plan',
+    'cached_plan'
 ]
@@ -0,0 +1,7 @@
+'''
+Benchmarks
+
+Run each benchmark as a module from the parent directory of the package, e.g.
+
+    python -m draft.benchmarks.clone
+'''
@@ -0,0 +1,69 @@
+# --- built in ---
+import copy
+import math
+import time
+import argparse
+
+# --- 3rd party ---
+# --- my module ---
+from ..draft_v2 import Draftable
+
+'''
+Compare the cost of constructing N keyed instances with the cost of cloning them 
+from a prototype (Draft.__clonestrategy__).
+'''
+
+
+class Heavy(Draftable):
+    '''A class with an expensive constructor'''
+    def __init__(self, size):
+        super(Heavy, self).__init__()
+        self.table = [math.sin(i) * math.cos(i) for i in range(size)]
+
+
+class HeavyConstruct(Heavy):
+    __clonestrategy__ = None
+
+class HeavyCopy(Heavy):
+    __clonestrategy__ = 'copy'
+
+class HeavyDeepcopy(Heavy):
+    __clonestrategy__ = 'deepcopy'
+
+class HeavyClone(Heavy):
+    __clonestrategy__ = 'clone'
+
+    def __clone__(self):
+        # the table only holds floats, a shallow copy is enough
+        inst = copy.copy(self)
+        inst.table = list(self.table)
+        return inst
+
+
+def run(cls, size, n):
+    draft = cls(size)
+
+    start = time.perf_counter()
+    for key in range(n):
+        draft.instantiate(key)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=200, help='number of keyed instances')
+    parser.add_argument('--size', type=int, default=20000, help='constructor workload')
+    args = parser.parse_args(argv)
+
+    print('{} keyed instances, size={}'.format(args.n, args.size))
+
+    base = run(HeavyConstruct, args.size, args.n)
+    print('{:<10s} {:>10.4f} s'.format('construct', base))
+
+    for name, cls in [('copy', HeavyCopy), ('deepcopy', HeavyDeepcopy), ('clone', HeavyClone)]:
+        t = run(cls, args.size, args.n)
+        print('{:<10s} {:>10.4f} s  ({:.1f}x)'.format(name, t, base / t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# --- built in ---
+import gc
+import time
+import argparse
+
+# --- 3rd party ---
+# --- my module ---
+from ..draft_v2 import Draftable
+
+'''
+Measure the cyclic GC work during heavy instantiate/evict churn, with strong and
+weak (__weakbackref__) back references from the instances to their drafts.
+'''
+
+
+class Strong(Draftable):
+    def __init__(self, value):
+        self.value = value
+        self.payload = [value] * 4
+
+class Weak(Strong):
+    __weakbackref__ = True
+
+
+class GCMonitor():
+    '''Collect GC pause times and collection counts via gc.callbacks'''
+    def __init__(self):
+        self.pauses = []
+        self.collections = [0, 0, 0]
+        self.collected = 0
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter()
+        else:
+            self.pauses.append(time.perf_counter() - self._start)
+            self.collections[info['generation']] += 1
+            self.collected += info['collected']
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *args):
+        gc.callbacks.remove(self)
+
+
+def churn(cls, drafts, keys, rounds, live):
+    # long-living cached instances, which the gen-2 collections have to traverse
+    alive = [cls(i) for i in range(live)]
+    for draft in alive:
+        for key in range(keys):
+            draft.instantiate(key)
+
+    gc.collect()
+
+    with GCMonitor() as monitor:
+        start = time.perf_counter()
+        for r in range(rounds):
+            batch = [cls(r) for _ in range(drafts)]
+            for draft in batch:
+                for key in range(keys):
+                    draft.instantiate(key)
+                # evict half of the instances
+                for key in range(0, keys, 2):
+                    draft.remove(key)
+            # drop the drafts with the rest of their instances
+            del batch
+        elapsed = time.perf_counter() - start
+
+    return elapsed, monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--drafts', type=int, default=100, help='drafts per round')
+    parser.add_argument('--keys', type=int, default=20, help='keyed instances per draft')
+    parser.add_argument('--rounds', type=int, default=200, help='number of rounds')
+    parser.add_argument('--live', type=int, default=2000, help='long-living drafts')
+    args = parser.parse_args(argv)
+
+    print('{:<8s} {:>8s} {:>10s} {:>10s} {:>20s} {:>10s}'.format(
+            'mode', 'time', 'gc total', 'gc max', 'collections(0/1/2)', 'collected'))
+
+    for name, cls in [('strong', Strong), ('weak', Weak)]:
+        elapsed, monitor = churn(cls, args.drafts, args.keys, args.rounds, args.live)
+        print('{:<8s} {:>7.3f}s {:>9.2f}ms {:>9.2f}ms {:>20s} {:>10d}'.format(
+                name, elapsed, sum(monitor.pauses) * 1000, max(monitor.pauses, default=0) * 1000,
+                '/'.join(map(str, monitor.collections)), monitor.collected))
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
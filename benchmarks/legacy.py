@@ -0,0 +1,123 @@
+# --- built in ---
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import importlib.util
+
+# --- 3rd party ---
+# --- my module ---
+from .. import draft_v1
+
+'''
+Measure the startup cost of a legacy-style BaseDraft hierarchy: class definitions, 
+draft creation and instantiation, compared with the original draft_v1 (the last 
+revision before it was ported onto draft_v2, taken from git). Pass --baseline to 
+compare with another draft_v1 implementation:
+
+    git show <commit>:draft_v1.py > /tmp/draft_v1_old.py
+    python -m draft.benchmarks.legacy --baseline /tmp/draft_v1_old.py
+'''
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('draft_v1_baseline', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_baseline(path):
+    '''
+    Extract the original draft_v1.py from git to path, return False if not available
+    '''
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    git = lambda *args: subprocess.run(('git', '-C', root) + args, capture_output=True, 
+                                        text=True, check=True).stdout
+
+    try:
+        # the commits adding the draft_v2 import, the oldest one is the port
+        commits = git('log', '--format=%H', '-S', 'from . import draft_v2', '--', 'draft_v1.py').split()
+        if not commits:
+            return False
+        source = git('show', '{}^:draft_v1.py'.format(commits[-1]))
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+    with open(path, 'w') as f:
+        f.write(source)
+    return True
+
+
+def build_hierarchy(module, width, depth):
+    '''
+    Define `width` class chains of `depth` levels inheriting from module.BaseDraft
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    classes = []
+    for w in range(width):
+        base = module.BaseDraft
+        for d in range(depth):
+            base = type('Module{}_{}'.format(w, d), (base,), {'__init__': __init__})
+            classes.append(base)
+    return classes
+
+
+def run(module, width, depth, redirect):
+    # the legacy module prints while defining classes
+    with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as stack:
+        if redirect:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+
+        start = time.perf_counter()
+        classes = build_hierarchy(module, width, depth)
+        defined = time.perf_counter()
+        drafts = [cls(value=i) for i, cls in enumerate(classes)]
+        for draft in drafts:
+            draft.instantiate()
+        done = time.perf_counter()
+
+    return defined - start, done - defined
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=50, help='number of class chains')
+    parser.add_argument('--depth', type=int, default=20, help='length of each class chain')
+    parser.add_argument('--baseline', default=None, help='path to another draft_v1.py, '
+                        'default to the original draft_v1.py in git')
+    parser.add_argument('--redirect', action='store_true', help='redirect stdout to {}'.format(os.devnull))
+    args = parser.parse_args(argv)
+
+    targets = [('draft_v1', draft_v1)]
+
+    with tempfile.TemporaryDirectory() as root:
+        baseline = args.baseline
+        if baseline is None:
+            baseline = os.path.join(root, 'draft_v1_baseline.py')
+            if not git_baseline(baseline):
+                print('The original draft_v1.py is not found in git, pass --baseline', file=sys.stderr)
+                baseline = None
+
+        if baseline is not None:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                targets.insert(0, ('baseline', load_module(baseline)))
+
+    results = [(name,) + run(module, args.width, args.depth, args.redirect) for name, module in targets]
+
+    # report to stderr, stdout may be flooded by the baseline
+    print('{} classes'.format(args.width * args.depth), file=sys.stderr)
+    for name, define, build in results:
+        line = '{:<10s} define {:>8.4f} s  draft+instantiate {:>8.4f} s'.format(name, define, build)
+        if name != 'baseline' and results[0][0] == 'baseline':
+            line += '  ({:.2f}x, {:.2f}x of baseline)'.format(define / results[0][1], build / results[0][2])
+        print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
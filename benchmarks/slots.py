@@ -0,0 +1,78 @@
+# --- built in ---
+import gc
+import argparse
+import tracemalloc
+
+# --- 3rd party ---
+# --- my module ---
+from ..draft_v2 import Draftable
+
+'''
+Measure the memory (bytes per instance) of small drafted value objects, with a 
+__dict__, with __slots__ reserving the metadata slots, and with __slots__ storing the
+metadata in the external weak map.
+'''
+
+
+class DictPoint(Draftable):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+class SlotPoint(Draftable):
+    __slots__ = ('x', 'y', '__draft__', '__instancename__')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+class WeakSlotPoint(Draftable):
+    __slots__ = ('x', 'y', '__weakref__')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def traced(fn, n):
+    '''Bytes allocated per call of fn, the results are kept alive'''
+    results = [None] * n
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        results[i] = fn(i)
+    total = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    return total / n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=100000, help='number of instances')
+    args = parser.parse_args(argv)
+
+    print('{} instances, bytes per instance'.format(args.n))
+    print('{:<14s} {:>10s} {:>12s}'.format('', 'object', 'instantiate'))
+
+    for cls in (DictPoint, SlotPoint, WeakSlotPoint):
+        draft = cls(1.0, 2.0)
+
+        # the object with its metadata
+        def build(key):
+            inst = cls.__instantiate__(1.0, 2.0)
+            inst.__instancename__ = key
+            inst.__draft__ = draft
+            return inst
+
+        obj = traced(build, args.n)
+        # including the draft bookkeeping (instance dict, reverse index, ...)
+        keyed = traced(draft.instantiate, args.n)
+
+        print('{:<14s} {:>10.1f} {:>12.1f}'.format(cls.__name__, obj, keyed))
+
+
+if __name__ == '__main__':
+    main()
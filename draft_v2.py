@@ -2,10 +2,21 @@
 import os
 import abc
 import sys
+import copy
+import copyreg
+import json
 import time
+import types
+import weakref
 import logging
+import threading
+import tracemalloc
+
+from multiprocessing import shared_memory
+from multiprocessing import resource_tracker
 
 from collections import OrderedDict
+from collections import deque
 
 # --- 3rd party ---
 # --- my module ---
@@ -22,6 +33,31 @@ Attributes:
             attached on the draft class.
         __draftwrappedparam__: (list, dict) The parameters used to instantiate an instance of the original class.
         __instancedict__: (dict) A <key, instance> mapping to store generated instances.
+        __instanceindex__: (dict) A <id(instance), key> mapping, the reverse index of __instancedict__.
+        __instancealloc__: (dict) A <key, stats> mapping to store the memory allocated by each build.
+            Only filled when allocation tracing is enabled by trace_allocations.
+        __clonestrategy__: (None, str) How to produce the keyed instances. None: call the constructor for
+            each key. 'copy', 'deepcopy': copy the prototype. 'clone': call prototype.__clone__(). This 
+            attribute can be declared on a Draftable class, then it is copied to its draft class.
+        __prototype__: The prototype instance which is cloned when __clonestrategy__ is not None.
+        __weakbackref__: (bool) Whether the instances refer back to the draft weakly (instance.__draft__),
+            so that the draft and its instances do not form reference cycles. This attribute can be 
+            declared on a Draftable class, then it is copied to its draft class. Draftable instances
+            dereference it, use get_draft(instance) for the instances of other classes.
+        __sharememory__: (bool) Whether to place large array parameters into shared memory when 
+            the draft is pickled (e.g. sent to worker processes). See Draft.share_memory.
+        __sharedblocks__: (dict) The shared memory blocks of the parameters, created and owned by this
+            process. They are unlinked when released.
+        __attachedblocks__: (dict) The shared memory blocks attached by the process unpickling the draft.
+            They are owned by another process, and only closed when released.
+        __draftversion__: (int) Increased whenever the parameters of this draft, or of any draft nested
+            in its parameters (dependency), are changed.
+        __instanceversion__: (dict) A <key, version> mapping, the __draftversion__ each instance was
+            built from. Instances built from an older version are stale and will be rebuilt.
+        __invalidation__: (str) When to rebuild stale instances. 'lazy': on the next instantiate/instance
+            call. 'eager': as soon as the parameters change.
+        __dependents__: (WeakSet) The drafts containing this draft in their parameters.
+        __changehooks__: (list) Callbacks called with the draft when it is invalidated.
 
     Original class instance:
         __draft__: The draft object that the class instance instantiated from. This attribute is attached on
@@ -56,11 +92,37 @@ __all__ = [
     'Draftable',
     'Instantiate',
     'is_draft',
-    'is_subdraft'
+    'is_subdraft',
+    'memory_report',
+    'trace_allocations',
+    'build_costs',
+    'save_build_costs',
+    'load_build_costs',
+    'get_draft',
+    'get_instancename'
 ]
 
 DEBUG = False
 
+# all alive drafts, used by memory_report
+_DRAFTS = weakref.WeakSet()
+
+# attribute allocations in Draft.instantiate to each build
+_TRACE_ALLOC = False
+# whether trace_allocations started tracemalloc
+_TRACE_STARTED = False
+
+# records Draft.instantiate/Draftable.__instantiate__ calls, see set_profiler
+_PROFILER = None
+
+# <class name, [count, total seconds]> of the builds in Draft.instantiate
+_BUILD_COSTS = {}
+_BUILD_COSTS_LOCK = threading.Lock()
+# (<class, [count, total seconds]>, consumed) records of each thread, which are 
+# aggregated into _BUILD_COSTS lazily
+_THREAD_COSTS = []
+_LOCAL_COSTS = threading.local()
+
 def _draft_factory(cls):
     '''
     _darft_factory
@@ -87,8 +149,8 @@ def _draft_factory(cls):
     # Custom function for custom Draft
     def __init__(self, *args, **kwargs):
         
-        # call super
-        _Draft.__init__(self, *args, **kwargs)
+        # set params
+        self.__setparam__(args, kwargs)
 
     
     def __repr__(self):
@@ -111,10 +173,9 @@ def _draft_factory(cls):
         Call class.__instantiate__
         '''
 
+        # __instancename__ defaults to None on Draftable instances
         inst = self.__draftwrappedclass__.__instantiate__(*args, **kwargs)
 
-        setattr(inst, '__instancename__', None)
-
         return inst
 
     
@@ -123,7 +184,10 @@ def _draft_factory(cls):
                   '__repr__': __repr__,
                   '__instantiate__': __instantiate__,
                   '__draftwrappedclass__': cls,
-                  '__draftwrappedparam__': ([], {})}
+                  '__draftwrappedparam__': ([], {}),
+                  '__clonestrategy__': getattr(cls, '__clonestrategy__', None),
+                  '__weakbackref__': getattr(cls, '__weakbackref__', False),
+                  '__invalidation__': getattr(cls, '__invalidation__', 'lazy')}
                   
                   
     # instantiate custom draft class              
@@ -248,12 +312,30 @@ class Draft(_Draft):
     default = _default
 
     __instancedict__ = None
+    __instanceindex__ = None
+    __instancealloc__ = None
+    __clonestrategy__ = None
+    __prototype__ = None
+    __weakbackref__ = False
+    __sharememory__ = False
+    __sharedblocks__ = None
+    __attachedblocks__ = None
+    __draftversion__ = 0
+    __instanceversion__ = None
+    __invalidation__ = 'lazy'
+    __dependents__ = None
+    __changehooks__ = None
 
     def __new__(cls, *args, **kwargs):
         inst = super(Draft, cls).__new__(cls, *args, **kwargs)
 
         # create attribute
         setattr(inst, '__instancedict__', OrderedDict())
+        setattr(inst, '__instanceindex__', {})
+        setattr(inst, '__instancealloc__', OrderedDict())
+        setattr(inst, '__instanceversion__', {})
+
+        _DRAFTS.add(inst)
 
         return inst
 
@@ -268,10 +350,216 @@ class Draft(_Draft):
         Initialize parameters
         '''
         # set params
+        self.__setparam__(args, kwargs)
+
+        return self
+
+    def __setparam__(self, args, kwargs):
+        '''
+        Set parameters, and invalidate the instances built from the old parameters
+        '''
+        # unregister from old dependencies
+        if _may_hold_drafts(self.__draftwrappedparam__):
+            for dep in _iter_drafts(self.__draftwrappedparam__):
+                if dep.__dependents__ is not None:
+                    dep.__dependents__.discard(self)
+
         super(Draft, self).__init__(*args, **kwargs)
 
+        # register to new dependencies
+        if _may_hold_drafts(self.__draftwrappedparam__):
+            for dep in _iter_drafts(self.__draftwrappedparam__):
+                if dep.__dependents__ is None:
+                    dep.__dependents__ = weakref.WeakSet()
+                dep.__dependents__.add(self)
+
+        # release shared blocks of the old params, only unlink the blocks we own
+        if self.__sharedblocks__:
+            _release_shared(self.__sharedblocks__, unlink=True)
+        if self.__attachedblocks__:
+            _release_shared(self.__attachedblocks__, unlink=False)
+
+        self.__invalidate__()
+
+    def __invalidate__(self):
+        '''
+        Mark all instances of this draft and of its dependents as stale, then rebuild
+        the eager ones. Dependencies are rebuilt before their dependents.
+        '''
+        if not self.__dependents__:
+            order = [self]
+        else:
+            order = self.__dependentorder__()
+
+        # mark stale before anything is rebuilt
+        for draft in order:
+            draft.__draftversion__ += 1
+            # the prototype is built from the old params
+            draft.__prototype__ = None
+
+            for hook in list(draft.__changehooks__ or ()):
+                hook(draft)
+
+        for draft in order:
+            if draft.__invalidation__ == 'eager':
+                draft.rebuild()
+
+    def __dependentorder__(self):
+        '''
+        Topological order of this draft and its dependent closure (reversed DFS post-order)
+        '''
+        order = []
+        seen = set()
+        stack = [(self, iter(list(self.__dependents__ or ())))]
+        seen.add(id(self))
+
+        while stack:
+            draft, deps = stack[-1]
+            for dep in deps:
+                if id(dep) not in seen:
+                    seen.add(id(dep))
+                    stack.append((dep, iter(list(dep.__dependents__ or ()))))
+                    break
+            else:
+                stack.pop()
+                order.append(draft)
+
+        order.reverse()
+
+        return order
+
+    def add_change_hook(self, hook):
+        '''
+        Register hook(draft), called when the parameters of this draft or of its
+        dependencies change.
+        '''
+        if self.__changehooks__ is None:
+            self.__changehooks__ = []
+        self.__changehooks__.append(hook)
+
+    def remove_change_hook(self, hook):
+        '''
+        Unregister hook, do nothing if it is not registered
+        '''
+        if self.__changehooks__ and hook in self.__changehooks__:
+            self.__changehooks__.remove(hook)
+
+    def is_stale(self, key=_default):
+        '''
+        Whether the instance of key was built from old parameters
+        '''
+        return (key in self.__instanceversion__ and 
+                self.__instanceversion__[key] != self.__draftversion__)
+
+    def rebuild(self):
+        '''
+        Rebuild all stale instances
+
+        Returns:
+            (list) The keys of the rebuilt instances
+        '''
+        keys = [key for key in self.__instancedict__ if self.is_stale(key)]
+
+        for key in keys:
+            self.remove(key)
+            self.instantiate(key)
+
+        return keys
+
+    def __reduce__(self):
+        '''
+        Pickle support. Only the class, the parameters and the options are pickled, the
+        cached instances are not. If __sharememory__ is enabled, large array parameters
+        are placed into shared memory and the unpickled draft receives zero-copy views.
+        '''
+        return self.__draftreduce__(self.__sharememory__)
+
+    def __draftreduce__(self, share):
+        '''
+        Reduce this draft for pickle
+
+        Args:
+            share: (bool) place large array parameters into shared memory.
+        '''
+        cls = type(self)
+        wrapped = self.__draftwrappedclass__
+
+        # the draft classes created by _draft_factory are not importable
+        if getattr(wrapped, '__draftclass__', None) is cls:
+            rv = (_rebuild_draft, (None, wrapped))
+        else:
+            rv = (_rebuild_draft, (cls, None))
+
+        state = {k: v for k, v in self.__dict__.items()
+                    if k not in _DRAFT_UNPICKLED_ATTRS}
+
+        if share:
+            state['__draftwrappedparam__'] = self.__shareparam__()
+
+        return rv + (state,)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if self.__sharememory__:
+            args, kwargs = self.__draftwrappedparam__
+
+            if any(isinstance(p, _SharedParam) for p in _iter_params(args, kwargs)):
+                blocks = {}
+                attach = lambda p: p.attach(blocks) if isinstance(p, _SharedParam) else p
+
+                args = tuple(attach(arg) for arg in args)
+                kwargs = {k: attach(v) for k, v in kwargs.items()}
+
+                self.__draftwrappedparam__ = (args, kwargs)
+                self.__attachedblocks__ = blocks
+                # this process does not own the blocks, only close them
+                weakref.finalize(self, _release_shared, blocks, False)
+
+        for dep in _iter_drafts(self.__draftwrappedparam__):
+            if dep.__dependents__ is None:
+                dep.__dependents__ = weakref.WeakSet()
+            dep.__dependents__.add(self)
+
+    def share_memory(self, enable=True):
+        '''
+        Place large array parameters into shared memory when this draft is pickled,
+        so that worker processes receive zero-copy views instead of pickled copies. The 
+        shared memory is released when this draft is garbage collected. The parameters
+        changed in place are copied into the shared memory again on the next pickle.
+
+        numpy arrays and memoryviews larger than SHARED_MIN_NBYTES are shared, and arrive
+        as numpy arrays and memoryviews. Other parameters (bytes, bytearray, array.array,
+        memoryviews of non-native formats, ...) are pickled as usual, since they can not 
+        be rebuilt on shared memory without a copy.
+
+        Call this before starting the worker processes, so that the forked workers share
+        the resource tracker of this process, and do not unlink the blocks on exit.
+        '''
+        self.__sharememory__ = enable
+
+        if enable:
+            resource_tracker.ensure_running()
+
         return self
 
+    def __shareparam__(self):
+        '''
+        Create (or reuse) the shared memory blocks for the parameters, return the 
+        parameters to pickle.
+        '''
+        args, kwargs = self.__draftwrappedparam__
+
+        if self.__sharedblocks__ is None:
+            self.__sharedblocks__ = {}
+            # this process owns the blocks, unlink them when the draft is gone
+            weakref.finalize(self, _release_shared, self.__sharedblocks__, True)
+
+        share = lambda p: _share_param(p, self.__sharedblocks__)
+
+        return (tuple(share(arg) for arg in args),
+                {k: share(v) for k, v in kwargs.items()})
+
     def __repr__(self):
         '''
         __repr__ sample: <Draft '__main__.A'>
@@ -298,9 +586,17 @@ class Draft(_Draft):
 
     def __contains__(self, item):
         '''
-        Whether containing instance (not key!!!!)
+        Whether containing instance (not key!!!!). Instances are compared by identity.
+        '''
+        key = self.__instanceindex__.get(id(item), _default)
+        
+        return self.__instancedict__.get(key, None) is item
+
+    def __delitem__(self, key):
+        '''
+        Remove instance by key (same as remove)
         '''
-        return item in self.__instancedict__.values()
+        self.remove(key)
     
     def __instantiate__(self, *args, **kwargs):
         '''
@@ -313,9 +609,36 @@ class Draft(_Draft):
 
         inst = self.__draftwrappedclass__(*args, **kwargs)
 
-        setattr(inst, '__instancename__', None)
+        _set_instancemeta(inst, '__instancename__', None)
 
         return inst
+
+    def __build__(self):
+        '''
+        Build a new instance from predefined parameters, either by calling __instantiate__
+        or by cloning the prototype, depending on __clonestrategy__.
+        '''
+        strategy = self.__clonestrategy__
+
+        if strategy is None:
+            args, kwargs = self.__draftwrappedparam__
+            return self.__instantiate__(*args, **kwargs)
+
+        if self.__prototype__ is None:
+            args, kwargs = self.__draftwrappedparam__
+            self.__prototype__ = self.__instantiate__(*args, **kwargs)
+
+        proto = self.__prototype__
+
+        if strategy == 'copy':
+            return copy.copy(proto)
+        elif strategy == 'deepcopy':
+            # do not copy the draft itself if it is referenced by the prototype
+            return copy.deepcopy(proto, {id(self): self})
+        elif strategy == 'clone':
+            return proto.__clone__()
+        else:
+            raise RuntimeError('Unknown clone strategy {} of {}'.format(strategy, self))
     
 
     def instantiate(self, key=_default, ignore=True):
@@ -327,28 +650,71 @@ class Draft(_Draft):
             ignore: (bool) ignore instance already exists error
         '''
         
-        # make new instance
-        if key not in self.__instancedict__:
-            # get params
-            args, kwargs = self.__draftwrappedparam__
+        profiler = _PROFILER
+        if profiler is not None:
+            token = profiler.begin('instantiate', self.__draftwrappedclass__, key)
+
+        try:
+            # drop stale instance
+            if self.is_stale(key):
+                self.remove(key)
+
+            # make new instance
+            if key not in self.__instancedict__:
+                # make instance 
+                if _TRACE_ALLOC and tracemalloc.is_tracing():
+                    before = tracemalloc.take_snapshot()
+                    start = time.perf_counter()
+                    inst = self.__build__()
+                    duration = time.perf_counter() - start
+                    after = tracemalloc.take_snapshot()
+
+                    stats = after.compare_to(before, 'filename')
+                    self.__instancealloc__[key] = {
+                        'size': sum(stat.size_diff for stat in stats),
+                        'count': sum(stat.count_diff for stat in stats)
+                    }
+                else:
+                    start = time.perf_counter()
+                    inst = self.__build__()
+                    duration = time.perf_counter() - start
+
+                _record_build_cost(self.__draftwrappedclass__, duration)
+                self.__setinstance__(key, inst)
             
-            # make instance 
-            inst = self.__instantiate__(*args, **kwargs)
-            
-            # set instance name
-            setattr(inst, '__instancename__', key)
-            # set original draft
-            setattr(inst, '__draft__', self)
-
-            self.__instancedict__[key] = inst
-            
-        else:
-            if not ignore:
-                raise RuntimeError('Key condlict! The instance of {} for key {} '\
-                            'already exists'.format(self.__draftwrappedclass__, key))
+            else:
+                if not ignore:
+                    raise RuntimeError('Key condlict! The instance of {} for key {} '\
+                                'already exists'.format(self.__draftwrappedclass__, key))
                 
-        return self.__instancedict__[key]
+            return self.__instancedict__[key]
+        finally:
+            if profiler is not None:
+                profiler.end(token)
         
+    def __setinstance__(self, key, inst):
+        '''
+        Cache inst, built from the current parameters, as the instance of key. An object
+        can only be cached under one key.
+        '''
+        other = self.__instanceindex__.get(id(inst), key)
+        if other != key and self.__instancedict__.get(other, None) is inst:
+            raise RuntimeError(('The instance {} of {} for key {} is already cached for key {}. '
+                        'Make sure __instantiate__/__clone__ returns a new object').format(
+                            object.__repr__(inst), self.__draftwrappedclass__, key, other))
+
+        # set instance name
+        _set_instancemeta(inst, '__instancename__', key)
+        # set original draft
+        if self.__weakbackref__:
+            _set_instancemeta(inst, '__draft__', weakref.ref(self))
+        else:
+            _set_instancemeta(inst, '__draft__', self)
+
+        self.__instancedict__[key] = inst
+        self.__instanceindex__[id(inst)] = key
+        self.__instanceversion__[key] = self.__draftversion__
+
     def instance(self, key=_default):
         '''
         Get instance by key (same as __getitem__)
@@ -357,8 +723,91 @@ class Draft(_Draft):
         if key not in self.__instancedict__:
             raise RuntimeError('The instance of {} for key {} does not exist'.format(
                                 self.__draftwrappedclass__, key))
+
+        if self.is_stale(key):
+            return self.instantiate(key)
                                 
         return self.__instancedict__[key]
+
+    def key_of(self, inst):
+        '''
+        Get key by instance. Instances are compared by identity.
+        '''
+
+        if inst not in self:
+            raise RuntimeError('The instance {} does not belong to {}'.format(
+                                object.__repr__(inst), self))
+
+        return self.__instanceindex__[id(inst)]
+
+    def remove(self, key=_default):
+        '''
+        Remove the instance by key from this draft
+
+        Returns:
+            The removed instance
+        '''
+
+        if key not in self.__instancedict__:
+            raise RuntimeError('The instance of {} for key {} does not exist'.format(
+                                self.__draftwrappedclass__, key))
+
+        inst = self.__instancedict__.pop(key)
+        del self.__instanceindex__[id(inst)]
+        del self.__instanceversion__[key]
+        self.__instancealloc__.pop(key, None)
+
+        return inst
+
+    def clear(self):
+        '''
+        Remove all instances from this draft
+        '''
+        self.__instancedict__.clear()
+        self.__instanceindex__.clear()
+        self.__instanceversion__.clear()
+        self.__instancealloc__.clear()
+
+    def memory_report(self):
+        '''
+        Estimate the memory held by this draft
+
+        The sizes are deep size estimates (in bytes) of the parameters and of each
+        instance. Other drafts, classes, modules and functions are not counted. The
+        'alloc' entry of an instance is only available if it was built while the 
+        allocation tracing is enabled (see trace_allocations).
+
+        Returns:
+            (dict) A JSON serializable report.
+        '''
+        args, kwargs = self.__draftwrappedparam__
+
+        params = {
+            'args': [_deep_sizeof(arg) for arg in args],
+            'kwargs': {str(k): _deep_sizeof(v) for k, v in kwargs.items()}
+        }
+        param_size = sum(params['args']) + sum(params['kwargs'].values())
+
+        instances = OrderedDict()
+        for key, inst in self.__instancedict__.items():
+            instances[_keystr(key)] = {
+                'size': _deep_sizeof(inst),
+                'alloc': self.__instancealloc__.get(key, None)
+            }
+        instance_size = sum(v['size'] for v in instances.values())
+
+        if self.__prototype__ is not None:
+            instance_size += _deep_sizeof(self.__prototype__)
+
+        return {
+            'draft': repr(self),
+            'class': _classname(self.__draftwrappedclass__),
+            'params': params,
+            'param_size': param_size,
+            'instances': instances,
+            'instance_size': instance_size,
+            'total_size': param_size + instance_size
+        }
         
 
 _BASEDRAFT = Draft
@@ -370,6 +819,19 @@ def set_baseclass(draft):
     global _BASEDRAFT
     assert issubclass(draft, Draft), 'draft must inherit from Draft'
     _BASEDRAFT = draft
+
+def get_profiler():
+    return _PROFILER
+
+def set_profiler(profiler):
+    '''
+    Set the profiler which records Draft.instantiate and Draftable.__instantiate__ calls.
+
+    The profiler must provide begin(name, cls, key) -> token and end(token). end is
+    always called, even if the call raises. Set to None to disable profiling.
+    '''
+    global _PROFILER
+    _PROFILER = profiler
         
 
 '''
@@ -377,7 +839,131 @@ def set_baseclass(draft):
 =        DraftMeta, Draftable         =
 =======================================
 '''
+
+# <id(instance), _MetaRef> metadata of the instances without __dict__
+_INSTANCE_META = {}
+_INSTANCE_META_NAMES = ('__draft__', '__instancename__')
+
+class _MetaRef(weakref.ref):
+    '''
+    A weak reference to an instance, holding the instance metadata in the slots of the
+    same names
+    '''
+    __slots__ = ('key',) + _INSTANCE_META_NAMES
+
+def _drop_instancemeta(ref):
+    _INSTANCE_META.pop(ref.key, None)
+
+def _set_instancemeta(inst, name, value):
+    '''
+    Attach metadata (__instancename__, __draft__) on inst. If inst can not hold the
+    attribute (e.g. __slots__ without __dict__), store it in the external weak map.
+    '''
+    try:
+        setattr(inst, name, value)
+    except AttributeError:
+        _set_external_instancemeta(inst, name, value)
+
+def _set_external_instancemeta(inst, name, value):
+    ref = _INSTANCE_META.get(id(inst), None)
+
+    if ref is None:
+        try:
+            ref = _MetaRef(inst, _drop_instancemeta)
+        except TypeError:
+            raise TypeError(('Can not attach {} on {} instance. Please add \'__draft__\' and '
+                    '\'__instancename__\', or \'__weakref__\' to __slots__').format(
+                        name, type(inst).__qualname__)) from None
+        ref.key = id(inst)
+        _INSTANCE_META[id(inst)] = ref
+
+    setattr(ref, name, value)
+
+def _get_instancemeta(inst, name):
+    try:
+        return getattr(inst, name)
+    except AttributeError:
+        ref = _INSTANCE_META.get(id(inst), None)
+        return None if ref is None else getattr(ref, name, None)
+
+def _deref_draft(value):
+    '''
+    Get the draft referred by a weak back reference (see Draft.__weakbackref__), None
+    if the draft is gone
+    '''
+    if type(value) is weakref.ReferenceType:
+        return value()
+
+    return value
+
+def get_draft(inst):
+    '''
+    Get the draft that inst is instantiated from
+    '''
+    return _deref_draft(_get_instancemeta(inst, '__draft__'))
+
+def get_instancename(inst):
+    '''
+    Get the instance name (key) of inst
+    '''
+    return _get_instancemeta(inst, '__instancename__')
+
+
+class _InstanceMeta():
+    '''
+    _InstanceMeta
+
+    Descriptor of the instance metadata of Draftable. The metadata is stored in the 
+    slot of the same name if the class reserves it, in the instance __dict__, or in the 
+    external weak map if there is no __dict__. Weak back references are dereferenced.
+    '''
+    def __init__(self, name, slot=None):
+        self.name = name
+        self.slot = slot   # the member descriptor of the reserved slot
+
+    def __get__(self, inst, owner=None):
+        if inst is None:
+            return self
+
+        if self.slot is not None:
+            try:
+                value = self.slot.__get__(inst, owner)
+            except AttributeError:
+                # unset slot
+                value = None
+        else:
+            try:
+                value = inst.__dict__.get(self.name, None)
+            except AttributeError:
+                ref = _INSTANCE_META.get(id(inst), None)
+                value = None if ref is None else getattr(ref, self.name, None)
+
+        # weak back reference, None if the draft is gone
+        if type(value) is weakref.ReferenceType:
+            return value()
+
+        return value
+
+    def __set__(self, inst, value):
+        if self.slot is not None:
+            self.slot.__set__(inst, value)
+            return
+
+        try:
+            inst.__dict__[self.name] = value
+        except AttributeError:
+            _set_external_instancemeta(inst, self.name, value)
         
+def _wrap_instancemeta_slots(cls):
+    '''
+    Replace the slots reserved for the instance metadata by _InstanceMeta, so that they
+    default to None and dereference weak back references
+    '''
+    for name in _INSTANCE_META_NAMES:
+        slot = cls.__dict__.get(name, None)
+        if isinstance(slot, types.MemberDescriptorType):
+            setattr(cls, name, _InstanceMeta(name, slot))
+
 class DraftMeta(abc.ABCMeta):
 
     '''
@@ -405,6 +991,7 @@ class DraftMeta(abc.ABCMeta):
     
         cls = super().__new__(_cls, name, bases, namespace, **kwargs)
         setattr(cls, '__draftclass__', _draft_factory(cls))
+        _wrap_instancemeta_slots(cls)
         
         return cls
         
@@ -417,7 +1004,7 @@ class DraftMeta(abc.ABCMeta):
 
     def __subclasscheck__(cls, subclass):
     
-        if issubclass(subclass, _Draft):
+        if issubclass(subclass, _Draft) and subclass.__draftwrappedclass__ is not None:
             inner_class_check = super().__subclasscheck__(subclass.__draftwrappedclass__)
         else:
             inner_class_check = False
@@ -440,14 +1027,22 @@ class Draftable(metaclass=DraftMeta):
         __draft__: The original draft that instantiate the instance
         __instancename__: The instance name (key) to instantiate
 
+    Subclasses can declare __slots__. The metadata above is then stored in the slots 
+    of the same names if declared, e.g. __slots__ = ('x', '__draft__', '__instancename__'),
+    or else in an external weak map, which requires '__weakref__' in __slots__. Prefer
+    reserving the slots: the external map costs a weak reference and a map entry per 
+    instance, more than a __dict__.
+
     Main interfaces:
         __new__: Create new draft instance using __draftclass__ attached on the original class.
         __init__: Do nothing
         __instantiate__: Instantiate a new instance of the original class.
     '''
 
-    __draft__ = None
-    __instancename__ = None
+    __slots__ = ()
+
+    __draft__ = _InstanceMeta('__draft__')
+    __instancename__ = _InstanceMeta('__instancename__')
     
     def __new__(cls, *args, **kwargs):
     
@@ -471,15 +1066,59 @@ class Draftable(metaclass=DraftMeta):
         '''
         Instantiate a new instance, same as the original __new__ function
         '''
-        inst = super(Draftable, cls).__new__(cls)
+        profiler = _PROFILER
+        if profiler is not None:
+            token = profiler.begin('__instantiate__', cls, None)
 
-        # create instance attributes
-        setattr(inst, '__instancename__', cls.__instancename__)
-        setattr(inst, '__draft__', cls.__draft__)
-        
-        inst.__init__(*args, **kwargs)
+        try:
+            # __instancename__, __draft__ default to None
+            inst = super(Draftable, cls).__new__(cls)
+            
+            inst.__init__(*args, **kwargs)
+
+            return inst
+        finally:
+            if profiler is not None:
+                profiler.end(token)
+
+    def __reduce_ex__(self, protocol):
+        '''
+        Copy/pickle support. The default reduction recreates the object by cls.__new__,
+        which returns a draft for Draftable classes.
+        '''
+        rv = super(Draftable, self).__reduce_ex__(protocol)
+
+        if isinstance(rv, tuple) and rv[0] is copyreg.__newobj__:
+            rv = (_new_draftable,) + rv[1:]
+
+        # weak back references can not be pickled, store the draft instead
+        if isinstance(rv, tuple) and len(rv) > 2:
+            state = rv[2]
+            if isinstance(state, tuple):
+                # (__dict__, slots)
+                state = tuple(_deref_state(s) for s in state)
+            else:
+                state = _deref_state(state)
+            rv = rv[:2] + (state,) + rv[3:]
+
+        return rv
 
-        return inst
+
+def _deref_state(state):
+    '''
+    Replace the weak back reference in the pickled state of an instance by the draft
+    '''
+    if isinstance(state, dict) and type(state.get('__draft__', None)) is weakref.ReferenceType:
+        state = dict(state)
+        state['__draft__'] = _deref_draft(state['__draft__'])
+
+    return state
+
+def _new_draftable(cls, *args):
+    '''
+    Create an uninitialized instance of a Draftable class (used by copy/pickle)
+    '''
+    return super(Draftable, cls).__new__(cls)
 
 
 
@@ -520,6 +1159,434 @@ def is_subdraft(obj, subclass=None):
         return (hasattr(obj, '__draftwrappedclass__') and issubclass(obj.__draftwrappedclass__, subclass))
 
 
+'''
+=======================================
+=            Shared memory            =
+=======================================
+'''
+
+# the minimum size (bytes) of a parameter to be placed into shared memory
+SHARED_MIN_NBYTES = 1 << 16
+
+# runtime attributes of drafts, which are not pickled
+_DRAFT_UNPICKLED_ATTRS = ('__instancedict__', '__instanceindex__', '__instancealloc__', 
+                          '__prototype__', '__sharedblocks__', '__attachedblocks__', '__draftversion__',
+                          '__instanceversion__', '__dependents__', '__changehooks__')
+
+def _rebuild_draft(cls, wrapped):
+    '''
+    Create an empty draft (used by pickle)
+    '''
+    if cls is None:
+        cls = wrapped.__draftclass__
+
+    return cls.__new__(cls)
+
+def _iter_params(args, kwargs):
+    yield from args
+    yield from kwargs.values()
+
+# the parameter types which can not contain drafts
+_ATOMIC_TYPES = frozenset((int, float, complex, bool, str, bytes, type(None)))
+
+def _may_hold_drafts(params):
+    '''
+    Whether the (args, kwargs) params may contain drafts, cheaper than _iter_drafts
+    '''
+    args, kwargs = params
+
+    for param in args:
+        if type(param) not in _ATOMIC_TYPES:
+            return True
+    for param in kwargs.values():
+        if type(param) not in _ATOMIC_TYPES:
+            return True
+
+    return False
+
+def _iter_drafts(obj):
+    '''
+    Iterate over the drafts nested in obj (through list, tuple, set and dict)
+    '''
+    seen = set()
+    stack = [obj]
+
+    while stack:
+        o = stack.pop()
+
+        if type(o) in _ATOMIC_TYPES or id(o) in seen:
+            continue
+        seen.add(id(o))
+
+        # check the containers first, the isinstance check of the Draft ABC is slow
+        if isinstance(o, dict):
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif isinstance(o, Draft):
+            yield o
+
+
+# blocks which could not be closed since their views are still in use
+_PENDING_SHARED = []
+
+class _SharedBlock(shared_memory.SharedMemory):
+    '''
+    _SharedBlock
+
+    SharedMemory which may be garbage collected while its views are still in use
+    '''
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+class _SharedParam():
+    '''
+    _SharedParam
+
+    A picklable handle of a parameter stored in shared memory
+    '''
+    def __init__(self, name, nbytes, format, shape, dtype=None):
+        self.name = name
+        self.nbytes = nbytes
+        self.format = format
+        self.shape = shape
+        self.dtype = dtype   # numpy dtype, None for other buffers
+
+    def attach(self, blocks):
+        '''
+        Attach the shared memory and return a zero-copy view
+        '''
+        if self.name not in blocks:
+            try:
+                # python >= 3.13, do not let the resource tracker unlink the block
+                shm = _SharedBlock(name=self.name, track=False)
+            except TypeError:
+                shm = _SharedBlock(name=self.name)
+            blocks[self.name] = (None, shm, self)
+
+        buf = blocks[self.name][1].buf[:self.nbytes]
+
+        if self.dtype is not None:
+            import numpy as np
+            return np.ndarray(self.shape, dtype=self.dtype, buffer=buf)
+
+        return buf.cast(self.format, self.shape)
+
+# the formats supported by memoryview.cast
+_CAST_FORMATS = frozenset('cbB?hHiIlLqQnNefdP')
+
+def _castable(format):
+    '''
+    Whether a buffer of format can be rebuilt by memoryview.cast
+    '''
+    return format[1:] in _CAST_FORMATS if format.startswith('@') else format in _CAST_FORMATS
+
+def _share_param(param, blocks):
+    '''
+    Copy param into shared memory if it is a large contiguous numpy array or memoryview,
+    return the handle. Otherwise, return param itself. The block of param is reused by the
+    later calls, its contents are refreshed, since param may be changed in place.
+    '''
+    # the other buffers (bytes, array.array, ...) can not be rebuilt on shared memory
+    is_array = hasattr(param, '__array_interface__')
+    if not (is_array or isinstance(param, memoryview)):
+        return param
+
+    try:
+        view = memoryview(param)
+    except TypeError:
+        return param
+
+    if id(param) in blocks:
+        _, shm, handle = blocks[id(param)]
+
+        if (view.nbytes, view.format, view.shape) == (handle.nbytes, handle.format, handle.shape):
+            if not view.readonly:
+                shm.buf[:view.nbytes] = view.cast('B')
+            view.release()
+            return handle
+
+        # resized, keep the old block for the drafts unpickled before
+        blocks[shm.name] = blocks.pop(id(param))
+
+    if view.nbytes < SHARED_MIN_NBYTES or not view.c_contiguous:
+        return param
+
+    # memoryview.cast only supports native single character formats
+    if not is_array and not _castable(view.format):
+        return param
+
+    shm = _SharedBlock(create=True, size=view.nbytes)
+    shm.buf[:view.nbytes] = view.cast('B')
+
+    handle = _SharedParam(shm.name, view.nbytes, view.format, view.shape,
+                          getattr(param, 'dtype', None) if hasattr(param, '__array_interface__') else None)
+    # keep param alive, so its id is not reused
+    blocks[id(param)] = (param, shm, handle)
+
+    view.release()
+
+    return handle
+
+def _release_shared(blocks, unlink):
+    '''
+    Close (and unlink) the shared memory blocks. The blocks whose views are still in
+    use are kept alive, and closed by the later calls.
+    '''
+    # retry the blocks which were in use
+    for shm in list(_PENDING_SHARED):
+        try:
+            shm.close()
+            _PENDING_SHARED.remove(shm)
+        except BufferError:
+            pass
+
+    for _, shm, _ in blocks.values():
+        try:
+            shm.close()
+        except BufferError:
+            _PENDING_SHARED.append(shm)
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+    blocks.clear()
+
+
+'''
+=======================================
+=            Memory report            =
+=======================================
+'''
+
+# objects which are shared by everyone, or reported by themselves
+_SIZEOF_SKIP = (type, _Draft, types.ModuleType, types.FunctionType,
+                types.BuiltinFunctionType, types.MethodType, 
+                weakref.ReferenceType)
+
+def _deep_sizeof(obj):
+    '''
+    Estimate the deep size of obj in bytes. Each object is counted once.
+    '''
+    seen = set()
+    size = 0
+    stack = [obj]
+
+    while stack:
+        o = stack.pop()
+
+        if id(o) in seen or isinstance(o, _SIZEOF_SKIP):
+            continue
+        seen.add(id(o))
+
+        size += sys.getsizeof(o)
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+
+        # instance attributes
+        d = getattr(o, '__dict__', None)
+        if isinstance(d, dict):
+            stack.append(d)
+
+        for c in type(o).__mro__:
+            slots = c.__dict__.get('__slots__', ())
+            for slot in ((slots,) if isinstance(slots, str) else slots):
+                if slot not in ('__dict__', '__weakref__') and hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+
+    return size
+
+def _keystr(key):
+    return 'default' if key is _default else str(key)
+
+def _classname(cls):
+    if cls is None:
+        return 'None'
+    return '{}.{}'.format(cls.__module__, cls.__qualname__)
+
+def trace_allocations(enable=True):
+    '''
+    Enable/Disable allocation tracing in Draft.instantiate. When enabled, tracemalloc 
+    snapshots are taken around each build and the net allocation is stored in 
+    draft.__instancealloc__. This is slow, only use it for diagnosis. Disabling stops
+    tracemalloc if it was started here.
+    '''
+    global _TRACE_ALLOC, _TRACE_STARTED
+    _TRACE_ALLOC = enable
+
+    if enable and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _TRACE_STARTED = True
+    elif not enable and _TRACE_STARTED:
+        tracemalloc.stop()
+        _TRACE_STARTED = False
+
+def memory_report(drafts=None, as_json=False):
+    '''
+    Estimate the memory held by drafts, per draft and per wrapped class
+
+    Args:
+        drafts: (list of Draft) drafts to report. If None, all alive drafts are reported.
+        as_json: (bool) return JSON string instead of dict.
+    '''
+
+    if drafts is None:
+        drafts = list(_DRAFTS)
+
+    reports = [draft.memory_report() for draft in drafts]
+
+    classes = OrderedDict()
+    for report in reports:
+        stats = classes.setdefault(report['class'], {
+            'drafts': 0,
+            'instances': 0,
+            'param_size': 0,
+            'instance_size': 0,
+            'alloc_size': 0,
+            'total_size': 0
+        })
+        allocs = [v['alloc'] for v in report['instances'].values() if v['alloc'] is not None]
+
+        stats['drafts'] += 1
+        stats['instances'] += len(report['instances'])
+        stats['param_size'] += report['param_size']
+        stats['instance_size'] += report['instance_size']
+        stats['alloc_size'] += sum(alloc['size'] for alloc in allocs)
+        stats['total_size'] += report['total_size']
+
+    report = {
+        'drafts': reports,
+        'classes': classes,
+        'total_size': sum(r['total_size'] for r in reports)
+    }
+
+    if as_json:
+        return json.dumps(report, indent=2)
+
+    return report
+
+
+'''
+=======================================
+=             Build costs             =
+=======================================
+'''
+
+def _record_build_cost(cls, seconds):
+    # the records of each thread are only written by the thread, no lock nor allocation
+    # is needed per build
+    try:
+        records = _LOCAL_COSTS.records
+    except AttributeError:
+        records = _LOCAL_COSTS.records = {}
+        with _BUILD_COSTS_LOCK:
+            _THREAD_COSTS.append((records, {}))
+
+    cost = records.get(cls, None)
+
+    if cost is None:
+        records[cls] = [1, seconds]
+    else:
+        cost[0] += 1
+        cost[1] += seconds
+
+def _aggregate_build_costs():
+    '''
+    Add the records of the threads, since the last call, into _BUILD_COSTS. Call with 
+    _BUILD_COSTS_LOCK held.
+    '''
+    for records, consumed in _THREAD_COSTS:
+        for cls, (count, total) in list(records.items()):
+            done_count, done_total = consumed.get(cls, (0, 0.0))
+
+            if count == done_count:
+                continue
+            consumed[cls] = (count, total)
+
+            name = _classname(cls)
+            cost = _BUILD_COSTS.get(name, None)
+
+            if cost is None:
+                _BUILD_COSTS[name] = [count - done_count, total - done_total]
+            else:
+                cost[0] += count - done_count
+                cost[1] += total - done_total
+
+def _merge_build_costs(costs):
+    '''
+    Add the <class name, [count, total seconds]> records of costs, e.g. the costs
+    recorded in another process.
+    '''
+    with _BUILD_COSTS_LOCK:
+        _aggregate_build_costs()
+
+        for name, (count, total) in costs.items():
+            cost = _BUILD_COSTS.get(name, None)
+
+            if cost is None:
+                _BUILD_COSTS[name] = [count, total]
+            else:
+                cost[0] += count
+                cost[1] += total
+
+def _take_build_costs():
+    '''
+    Return the <class name, [count, total seconds]> records, and clear them
+    '''
+    with _BUILD_COSTS_LOCK:
+        _aggregate_build_costs()
+        costs = dict(_BUILD_COSTS)
+        _BUILD_COSTS.clear()
+
+    return costs
+
+def build_costs():
+    '''
+    Return the recorded build durations of Draft.instantiate per wrapped class.
+    The durations include the builds of nested drafts.
+
+    Returns:
+        (dict) A <class name, {'count': int, 'mean': seconds}> mapping.
+    '''
+    with _BUILD_COSTS_LOCK:
+        _aggregate_build_costs()
+        return {name: {'count': count, 'mean': total / count} 
+                    for name, (count, total) in _BUILD_COSTS.items()}
+
+def save_build_costs(path):
+    '''
+    Save the recorded build durations as JSON, so that the next runs can load them.
+    '''
+    with _BUILD_COSTS_LOCK:
+        _aggregate_build_costs()
+        costs = {name: list(cost) for name, cost in _BUILD_COSTS.items()}
+
+    with open(path, 'w') as f:
+        json.dump(costs, f, indent=2)
+
+def load_build_costs(path):
+    '''
+    Load the build durations saved by save_build_costs. The records of the classes
+    in the file are replaced, since the file already accumulates the previous runs.
+    '''
+    with open(path, 'r') as f:
+        costs = json.load(f)
+
+    with _BUILD_COSTS_LOCK:
+        _aggregate_build_costs()
+        for name, (count, total) in costs.items():
+            _BUILD_COSTS[name] = [count, total]
+
+
 if __name__ == '__main__':
     
     class A(Draftable):
@@ -629,4 +1696,265 @@ if __name__ == '__main__':
     assert not is_draft(a, draft_b), 'a is a draft of draft_b'
     assert not is_draft(b, draft_a),'b is a draft of draft_a'
 
-    print('Stage 4: Clear')
\ No newline at end of file
+    print('Stage 4: Clear')
+
+    report = memory_report([draft_a, draft_b])
+
+    assert report['drafts'][0]['instances']['default']['size'] > 0, 'a is not reported'
+    assert report['classes']['__main__.B']['instances'] == 1, 'b is not reported'
+
+    trace_allocations(True)
+    draft_b.instantiate('traced')
+    assert draft_b.__instancealloc__['traced']['count'] > 0, 'the allocations are not traced'
+    trace_allocations(False)
+    assert not tracemalloc.is_tracing(), 'tracemalloc is not stopped'
+
+    print('Stage 5: Clear')
+
+    assert a in draft_a, 'a is not in draft_a'
+    assert a not in draft_b, 'a is in draft_b'
+    assert draft_a.key_of(a) is Draft.default, 'the key of a is not default'
+
+    del draft_a[Draft.default]
+    
+    assert a not in draft_a, 'a is in draft_a'
+    assert len(draft_a) == 0, 'draft_a is not empty'
+
+    print('Stage 6: Clear')
+    class Leaf(Draftable):
+        def __init__(self, x):
+            self.x = x
+
+    class Mid(Draftable):
+        def __init__(self, leaf):
+            self.leaf = Instantiate(leaf)
+
+    class Top(Draftable):
+        def __init__(self, leaf, mid):
+            self.leaf = Instantiate(leaf)
+            self.mid = Instantiate(mid)
+
+    # lazy
+    leaf = Leaf(x=1)
+    mid = Mid(leaf)
+    mid.instantiate()
+    changed = []
+    mid.add_change_hook(changed.append)
+    leaf(x=2)
+
+    assert mid.is_stale(), 'mid is not stale'
+    assert changed == [mid], 'the change hook is not called'
+    assert mid.instance().leaf.x == 2, 'mid is not rebuilt lazily'
+
+    mid.remove_change_hook(changed.append)
+    leaf.remove_change_hook(changed.append)
+
+    # eager, nested diamond: Top(leaf, Mid(leaf))
+    class EagerLeaf(Leaf):
+        __invalidation__ = 'eager'
+
+    class EagerMid(Mid):
+        __invalidation__ = 'eager'
+
+    class EagerTop(Top):
+        __invalidation__ = 'eager'
+
+    for x in range(8):
+        leaf = EagerLeaf(x=0)
+        mid = EagerMid(leaf)
+        top = EagerTop(leaf, mid)
+        top.instantiate()
+        leaf(x=x)
+
+        assert not top.is_stale() and not mid.is_stale(), 'the eager drafts are not rebuilt'
+        inst = top.__instancedict__[Draft.default]
+        assert inst.leaf.x == x and inst.mid.leaf.x == x, 'top is rebuilt from a stale dependency'
+
+    print('Stage 7: Clear')
+
+    class SlotPoint(Draftable):
+        __slots__ = ('x', '__draft__', '__instancename__')
+
+        def __init__(self, x):
+            self.x = x
+
+    class WeakSlotPoint(Draftable):
+        __slots__ = ('x', '__weakref__')
+
+        def __init__(self, x):
+            self.x = x
+
+    for cls in (SlotPoint, WeakSlotPoint):
+        point = cls(x=1)
+        p = point.instantiate('p')
+
+        assert not hasattr(p, '__dict__'), 'the instance has __dict__'
+        assert p.__draft__ is point and get_draft(p) is point, 'the draft is not attached'
+        assert p.__instancename__ == 'p' and get_instancename(p) == 'p', 'the name is not attached'
+
+        # anonymous instances and clone prototypes
+        anonymous = cls.__instantiate__(2)
+        assert anonymous.__draft__ is None and get_draft(anonymous) is None, \
+                    'the anonymous instance has a draft'
+        assert anonymous.__instancename__ is None, 'the anonymous instance has a name'
+
+        point.__clonestrategy__ = 'copy'
+        q = point.instantiate('q')
+        assert q is not point.__prototype__ and q.__instancename__ == 'q', 'the clone is not renamed'
+        assert point.__prototype__.__draft__ is None, 'the prototype has a draft'
+
+    print('Stage 8: Clear')
+
+    class Weak(Draftable):
+        __weakbackref__ = True
+
+        def __init__(self, x):
+            self.x = x
+
+    class WeakSlot(Draftable):
+        __slots__ = ('x', '__draft__', '__instancename__')
+        __weakbackref__ = True
+
+        def __init__(self, x):
+            self.x = x
+
+    class Plain():
+        def __init__(self, x):
+            self.x = x
+
+    import pickle
+    import gc
+
+    for make in (Weak, WeakSlot, lambda x: Draft(Plain)(x=x)):
+        draft = make(x=1)
+        draft.__weakbackref__ = True
+        inst = draft.instantiate()
+
+        assert get_draft(inst) is draft, 'get_draft does not return the draft'
+        if isinstance(inst, Draftable):
+            assert inst.__draft__ is draft, 'the draft is not resolved'
+
+            copied = pickle.loads(pickle.dumps(inst))
+            assert copied.x == 1 and is_draft(get_draft(copied)), 'the instance is not picklable'
+            del copied
+
+        del draft
+        gc.collect()
+
+        assert get_draft(inst) is None, 'the draft is alive'
+        if isinstance(inst, Draftable):
+            assert inst.__draft__ is None, 'the draft is resolved after it is dropped'
+
+    print('Stage 9: Clear')
+
+    class Proto(Draftable):
+        def __init__(self, items):
+            self.items = list(items)
+
+        def __clone__(self):
+            return type(self).__instantiate__(self.items)
+
+    for strategy in ('copy', 'deepcopy', 'clone'):
+        proto = Proto([1, 2])
+        proto.__clonestrategy__ = strategy
+
+        p1 = proto.instantiate('p1')
+        p2 = proto.instantiate('p2')
+
+        assert p1 is not p2 and proto.__prototype__ not in (p1, p2), 'the clones are not distinct'
+        assert p1.__instancename__ == 'p1' and p2.__instancename__ == 'p2', 'the clones are not renamed'
+        assert p1.__draft__ is proto and p2.__draft__ is proto, 'the clones are not attached'
+        assert p1.items == [1, 2], 'the clone is not built from the params'
+        assert (p1.items is p2.items) == (strategy == 'copy'), 'the clone is not copied by ' + strategy
+
+        proto(items=[3])
+
+        assert proto.__prototype__ is None, 'the prototype is not dropped'
+        assert proto.instance('p1').items == [3], 'the clone is built from the old prototype'
+
+    print('Stage 10: Clear')
+
+    class Weights(Draftable):
+        def __init__(self, data, name):
+            self.data = data
+            self.name = name
+
+    data = os.urandom(SHARED_MIN_NBYTES * 2)
+    weights = Weights(memoryview(data), name='w').share_memory()
+
+    copied = pickle.loads(pickle.dumps(weights))
+    w = copied.instantiate()
+
+    assert w.name == 'w', 'the small parameter is changed'
+    assert isinstance(w.data, memoryview) and w.data == data, 'the shared parameter is changed'
+
+    names = [shm.name for _, shm, _ in weights.__sharedblocks__.values()]
+    assert names and not copied.__sharedblocks__, 'the unpickled draft owns the blocks'
+
+    del copied, w
+    gc.collect()
+    # still attachable while the owner is alive
+    shared_memory.SharedMemory(name=names[0]).close()
+
+    del weights
+    gc.collect()
+
+    for name in names:
+        try:
+            shared_memory.SharedMemory(name=name).close()
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError('the block {} is not unlinked'.format(name))
+
+    # changed in place after the first pickle
+    table = bytearray(SHARED_MIN_NBYTES)
+    weights = Weights(memoryview(table), name='t').share_memory()
+    pickle.dumps(weights)
+    table[0] = 7
+    assert pickle.loads(pickle.dumps(weights)).instantiate().data[0] == 7, \
+                'the change is not shared'
+    del weights
+
+    # the other buffers are pickled as usual, and keep their types
+    import array
+    import ctypes
+    raw = bytes(SHARED_MIN_NBYTES)
+    table = array.array('d', range(SHARED_MIN_NBYTES))
+    weights = Weights(raw, name=table).share_memory()
+
+    w = pickle.loads(pickle.dumps(weights)).instantiate()
+    assert type(w.data) is bytes and w.data == raw, 'the bytes parameter is changed'
+    assert type(w.name) is array.array and w.name == table, 'the array parameter is changed'
+    assert not weights.__sharedblocks__, 'the buffers are shared'
+
+    ints = memoryview((ctypes.c_int * SHARED_MIN_NBYTES)())
+    assert _share_param(ints, {}) is ints, 'the non-native format is shared'
+    del weights, w
+
+    print('Stage 11: Clear')
+
+    # one object under two keys
+    class Single(Draftable):
+        def __init__(self):
+            pass
+
+        def __clone__(self):
+            return self
+
+    single = Single()
+    single.__clonestrategy__ = 'clone'
+    s1 = single.instantiate('a')
+
+    try:
+        single.instantiate('b')
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('the instance is cached under two keys')
+
+    assert s1 in single and single.key_of(s1) == 'a', 'the index is corrupted'
+    single.remove('a')
+    assert s1 not in single and len(single) == 0, 'the instance is not removed'
+
+    print('Stage 12: Clear')
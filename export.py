@@ -0,0 +1,240 @@
+# --- built in ---
+import os
+import mmap
+import pickle
+
+# --- 3rd party ---
+# --- my module ---
+from . import draft_v2
+
+'''
+Export drafts to a small manifest plus a side file holding the large buffer parameters
+(numpy arrays, bytes, bytearray, array.array, memoryview). Loading maps the side file 
+with mmap, so the parameters are not read nor copied until they are used.
+
+>>> export_drafts([draft_a, draft_b], 'config.draft')  # writes config.draft, config.draft.data
+>>> draft_a, draft_b = load_drafts('config.draft')
+'''
+
+
+__all__ = [
+    'export_drafts',
+    'load_drafts'
+]
+
+# the minimum size (bytes) of a parameter to be written to the side file
+SIDE_MIN_NBYTES = 1 << 16
+# the alignment (bytes) of each buffer in the side file
+SIDE_ALIGNMENT = 64
+
+_MANIFEST_VERSION = 2
+
+
+def _side_buffers(drafts, min_nbytes):
+    '''
+    Collect the large contiguous buffer parameters of drafts and their nested drafts
+    '''
+    buffers = {}
+    seen = set()
+    stack = list(drafts)
+
+    while stack:
+        draft = stack.pop()
+
+        if id(draft) in seen:
+            continue
+        seen.add(id(draft))
+
+        stack.extend(draft_v2._iter_drafts(draft.__draftwrappedparam__))
+
+        for param in draft_v2._iter_params(*draft.__draftwrappedparam__):
+            try:
+                view = memoryview(param)
+            except TypeError:
+                continue
+
+            if view.nbytes < min_nbytes or not view.c_contiguous:
+                continue
+
+            # memoryview.cast only supports native single character formats, the other
+            # buffers are pickled inline
+            if hasattr(param, '__array_interface__') or draft_v2._castable(view.format):
+                buffers[id(param)] = (param, view)
+
+    return buffers
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, buffers, data):
+        super(_Pickler, self).__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffers = buffers
+        self.data = data
+        self.written = {}
+
+    def reducer_override(self, obj):
+        # write the raw parameters, even if the draft shares its memory with workers
+        if isinstance(obj, draft_v2.Draft):
+            return obj.__draftreduce__(False)
+
+        return NotImplemented
+
+    def persistent_id(self, obj):
+        if id(obj) not in self.buffers:
+            return None
+
+        if id(obj) not in self.written:
+            param, view = self.buffers[id(obj)]
+
+            # pad to alignment
+            offset = self.data.tell()
+            padding = -offset % SIDE_ALIGNMENT
+            self.data.write(b'\0' * padding)
+            offset += padding
+
+            self.data.write(view.cast('B'))
+
+            dtype = getattr(param, 'dtype', None) if hasattr(param, '__array_interface__') else None
+            self.written[id(obj)] = ('buffer', offset, view.nbytes, view.format, view.shape, dtype)
+
+        return self.written[id(obj)]
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, data_path):
+        super(_Unpickler, self).__init__(file)
+        self.data_path = data_path
+        self.mmap = None
+
+    def persistent_load(self, pid):
+        tag, offset, nbytes, format, shape, dtype = pid
+
+        if tag != 'buffer':
+            raise pickle.UnpicklingError('Unknown persistent id {}'.format(tag))
+
+        if self.mmap is None:
+            with open(self.data_path, 'rb') as f:
+                # copy-on-write, the views are writable without touching the file
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        buf = memoryview(self.mmap)[offset:offset+nbytes]
+
+        if dtype is not None:
+            import numpy as np
+            return np.frombuffer(buf, dtype=dtype).reshape(shape)
+
+        return buf.cast(format, shape)
+
+
+def export_drafts(drafts, path, min_nbytes=SIDE_MIN_NBYTES):
+    '''
+    Export drafts (and the drafts nested in their parameters) to path. The parameters 
+    which are contiguous buffers larger than min_nbytes are written to path + '.data',
+    aligned to SIDE_ALIGNMENT bytes. Cached instances are not exported.
+
+    Args:
+        drafts: (list of Draft) drafts to export.
+        path: (str) path of the manifest.
+        min_nbytes: (int) the minimum size of a parameter to be written to the side file.
+    '''
+    drafts = list(drafts)
+    buffers = _side_buffers(drafts, min_nbytes)
+    data_path = path + '.data'
+
+    with open(path, 'wb') as f, open(data_path, 'wb') as data:
+        # the header is read before the drafts, which refer to the side file
+        pickle.dump({
+            'version': _MANIFEST_VERSION,
+            'data': os.path.basename(data_path) if buffers else None
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        _Pickler(f, buffers, data).dump(drafts)
+
+    if not buffers:
+        os.remove(data_path)
+
+def load_drafts(path):
+    '''
+    Load the drafts exported by export_drafts. The large buffer parameters are 
+    zero-copy views of the memory-mapped side file: numpy arrays are loaded as numpy
+    arrays, other buffers as memoryview. They are copy-on-write, writing to them does 
+    not modify the side file.
+
+    Returns:
+        (list of Draft) the exported drafts.
+    '''
+    with open(path, 'rb') as f:
+        try:
+            header = pickle.load(f)
+        except pickle.UnpicklingError:
+            header = {}
+
+        version = header.get('version', None)
+        if version != _MANIFEST_VERSION:
+            raise RuntimeError('Unsupported draft manifest version {}'.format(version))
+
+        data_path = None
+        if header['data'] is not None:
+            data_path = os.path.join(os.path.dirname(path), header['data'])
+
+        return _Unpickler(f, data_path).load()
+
+
+if __name__ == '__main__':
+
+    import array
+    import tempfile
+
+    class Model(draft_v2.Draftable):
+        def __init__(self, weights, table, sub=None):
+            self.weights = weights
+            self.table = table
+            self.sub = draft_v2.Instantiate(sub)
+
+    weights = os.urandom(SIDE_MIN_NBYTES * 4)
+    table = array.array('d', range(SIDE_MIN_NBYTES))
+
+    sub = Model(weights, table=[1, 2, 3])
+    text = 'x' * (SIDE_MIN_NBYTES // 2)
+
+    shared = Model(memoryview(bytearray(weights)), table=array.array('u', text))
+    shared.share_memory()
+    model = Model(weights, table=table, sub=sub)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'config.draft')
+
+        export_drafts([model, shared], path)
+
+        # only the 'u' array is inlined
+        assert os.path.getsize(path) < 4096 + SIDE_MIN_NBYTES * 2, 'the manifest is not small'
+        # weights and table are written once, the weights of the shared draft once
+        assert os.path.getsize(path + '.data') >= len(weights) * 2 + table.itemsize * len(table), \
+                    'the buffers are not written to the side file'
+        assert not shared.__sharedblocks__, 'the shared draft is exported through shared memory'
+
+        # the side file is found by the recorded name
+        os.rename(path, os.path.join(root, 'renamed.draft'))
+        path = os.path.join(root, 'renamed.draft')
+
+        model, shared = load_drafts(path)
+
+        m = model.instantiate()
+        s = shared.instantiate()
+
+        assert isinstance(m.weights, memoryview), 'weights is not loaded as a view'
+        assert m.weights == weights, 'weights is changed'
+        assert m.sub.weights == weights, 'the weights of the nested draft is changed'
+        assert list(m.table) == list(table), 'table is changed'
+        assert m.sub.table == [1, 2, 3], 'the small parameter is changed'
+        assert s.weights == weights, 'the weights of the shared draft is changed'
+        # memoryview.cast does not support 'u', pickled inline
+        assert type(s.table) is array.array and s.table.tounicode() == text, \
+                    'the non-native format is changed'
+
+        # copy-on-write
+        m.table[0] = -1.0
+        assert load_drafts(path)[0].__draftwrappedparam__[1]['table'][0] == 0.0, 'the side file is modified'
+
+        del model, shared, m, s
+
+    print('export: Clear')
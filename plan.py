@@ -0,0 +1,376 @@
+# --- built in ---
+import os
+import sys
+import copy
+import types
+import pickle
+import importlib
+
+# --- 3rd party ---
+# --- my module ---
+from . import draft_v2
+
+'''
+Compile a draft configuration into a build plan cached on disk. The plan is a 
+topologically ordered list of constructors with their normalized arguments, the 
+drafts nested in the arguments are replaced by references to the earlier steps. 
+Executing a plan builds the instances directly, without re-creating the drafts.
+
+>>> plan = cached_plan('config.plan', make_drafts)  # compiles on the first run
+>>> model, optimizer = plan.execute()
+'''
+
+
+__all__ = [
+    'BuildPlan',
+    'compile_plan',
+    'load_plan',
+    'cached_plan'
+]
+
+_PLAN_VERSION = 1
+
+
+class _PlanRef():
+    '''
+    Reference to the instance built by an earlier step
+    '''
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __reduce__(self):
+        return (_PlanRef, (self.index,))
+
+
+def _replace(obj, fn):
+    '''
+    Replace the objects nested in obj (through list, tuple, set and dict) by fn
+    '''
+    obj = fn(obj)
+
+    if isinstance(obj, dict):
+        # keep the state of dict subclasses, e.g. defaultdict.default_factory
+        new_obj = copy.copy(obj)
+        for k, v in obj.items():
+            new_obj[k] = _replace(v, fn)
+        return new_obj
+    elif isinstance(obj, tuple) and hasattr(obj, '_make'):
+        # namedtuple
+        return obj._make(_replace(v, fn) for v in obj)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        return type(obj)(_replace(v, fn) for v in obj)
+
+    return obj
+
+def _resolve(module, qualname):
+    '''
+    Import the class by name. The classes decorated by @Draft resolve to drafts,
+    return the wrapped class instead.
+    '''
+    obj = importlib.import_module(module)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+
+    if draft_v2.is_draft(obj):
+        obj = obj.__draftwrappedclass__
+
+    return obj
+
+def _param_modules(obj):
+    '''
+    Iterate over the modules defining the types (or the classes and functions) nested 
+    in obj (through list, tuple, set and dict)
+    '''
+    seen = set()
+    stack = [obj]
+
+    while stack:
+        o = stack.pop()
+
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+
+        if isinstance(o, (type, types.FunctionType)):
+            yield o.__module__
+        else:
+            yield type(o).__module__
+
+def _stat(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class BuildPlan():
+    '''
+    BuildPlan
+
+    Attributes:
+        steps: (list) (class, args, kwargs, has_refs) in topological order, the 
+            dependencies come first.
+        roots: (list) the step indices of the compiled drafts.
+        sources: (dict) <path, (mtime_ns, size)> of the source files the plan depends on.
+    '''
+    def __init__(self, steps, roots, sources):
+        self.steps = steps
+        self.roots = roots
+        self.sources = sources
+
+    def __len__(self):
+        return len(self.steps)
+
+    def is_stale(self):
+        '''
+        Whether any source file changed since the plan was compiled
+        '''
+        for path, stat in self.sources.items():
+            try:
+                if _stat(path) != stat:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def execute(self):
+        '''
+        Build all steps in order
+
+        Returns:
+            (list) the instances of the compiled drafts (default key).
+        '''
+        results = [None] * len(self.steps)
+        deref = lambda o: results[o.index] if isinstance(o, _PlanRef) else o
+
+        for index, (cls, args, kwargs, has_refs) in enumerate(self.steps):
+            if has_refs:
+                args = _replace(args, deref)
+                kwargs = _replace(kwargs, deref)
+
+            if issubclass(cls, draft_v2.Draftable):
+                inst = cls.__instantiate__(*args, **kwargs)
+            else:
+                inst = cls(*args, **kwargs)
+
+            draft_v2._set_instancemeta(inst, '__instancename__', draft_v2.Draft.default)
+            results[index] = inst
+
+        return [results[index] for index in self.roots]
+
+    def save(self, path):
+        steps = [(cls.__module__, cls.__qualname__, args, kwargs, has_refs)
+                    for cls, args, kwargs, has_refs in self.steps]
+
+        with open(path, 'wb') as f:
+            pickle.dump({
+                'version': _PLAN_VERSION,
+                'sources': self.sources,
+                'steps': steps,
+                'roots': self.roots
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def compile_plan(drafts, path=None, depends=()):
+    '''
+    Flatten drafts, and the drafts nested in their parameters, into a build plan
+
+    Args:
+        drafts: (list of Draft) the drafts to compile.
+        path: (str) if given, save the plan to this path.
+        depends: (list of str) extra files the plan depends on, e.g. config files.
+            The source files of the classes and of the argument types are always 
+            included.
+
+    Returns:
+        (BuildPlan) the compiled plan.
+    '''
+    steps = []
+    index = {}    # <id(draft), step index>
+    visiting = set()
+
+    def visit(draft):
+        if id(draft) in index:
+            return index[id(draft)]
+
+        if id(draft) in visiting:
+            raise RuntimeError('Circular dependency detected at {}'.format(draft))
+        visiting.add(id(draft))
+
+        args, kwargs = draft.__draftwrappedparam__
+
+        # dependencies first
+        has_refs = False
+        for dep in draft_v2._iter_drafts((args, kwargs)):
+            visit(dep)
+            has_refs = True
+
+        if has_refs:
+            ref = lambda o: _PlanRef(index[id(o)]) if isinstance(o, draft_v2.Draft) else o
+            args = _replace(tuple(args), ref)
+            kwargs = {k: _replace(v, ref) for k, v in kwargs.items()}
+
+        # normalize
+        args = tuple(args)
+        kwargs = {k: kwargs[k] for k in sorted(kwargs)}
+
+        steps.append((draft.__draftwrappedclass__, args, kwargs, has_refs))
+        index[id(draft)] = len(steps) - 1
+        visiting.discard(id(draft))
+
+        return index[id(draft)]
+
+    roots = [visit(draft) for draft in drafts]
+
+    # the modules of the classes and of the argument types
+    modules = set()
+    for cls, args, kwargs, _ in steps:
+        modules.add(cls.__module__)
+        modules.update(_param_modules((args, kwargs)))
+    modules.discard('builtins')
+
+    sources = {}
+    files = [getattr(sys.modules.get(module), '__file__', None) for module in sorted(modules)]
+    for file in files + list(depends):
+        if file is not None:
+            sources[os.path.abspath(file)] = _stat(file)
+
+    plan = BuildPlan(steps, roots, sources)
+
+    if path is not None:
+        plan.save(path)
+
+    return plan
+
+def load_plan(path):
+    '''
+    Load the plan saved by compile_plan
+
+    Returns:
+        (BuildPlan) the plan, or None if the file does not exist, was saved by another
+        plan version, or any source file changed.
+    '''
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, ImportError, AttributeError, pickle.UnpicklingError):
+        # missing, broken, or refers to classes which no longer exist
+        return None
+
+    if data.get('version', None) != _PLAN_VERSION:
+        return None
+
+    plan = BuildPlan([], data['roots'], data['sources'])
+
+    if plan.is_stale():
+        return None
+
+    try:
+        plan.steps = [(_resolve(module, qualname), args, kwargs, has_refs)
+                        for module, qualname, args, kwargs, has_refs in data['steps']]
+    except (ImportError, AttributeError):
+        return None
+
+    return plan
+
+def cached_plan(path, make_drafts, depends=()):
+    '''
+    Load the plan from path, or compile it from make_drafts() if the plan does not 
+    exist or is stale.
+
+    Args:
+        path: (str) path of the cached plan.
+        make_drafts: (callable) returns the list of drafts to compile. The source file
+            of make_drafts is included in the dependencies.
+        depends: (list of str) extra files the plan depends on.
+    '''
+    plan = load_plan(path)
+
+    if plan is None:
+        depends = list(depends)
+        code = getattr(make_drafts, '__code__', None)
+        if code is not None and os.path.exists(code.co_filename):
+            depends.append(code.co_filename)
+
+        plan = compile_plan(make_drafts(), path=path, depends=depends)
+
+    return plan
+
+
+if __name__ == '__main__':
+
+    import tempfile
+    from collections import namedtuple, defaultdict
+
+    Pair = namedtuple('Pair', ['first', 'second'])
+
+    class Encoder(draft_v2.Draftable):
+        def __init__(self, dim):
+            self.dim = dim
+
+    class Model(draft_v2.Draftable):
+        def __init__(self, pair, table, lr=0.1):
+            self.pair = Pair(*map(draft_v2.Instantiate, pair))
+            self.table = table
+            self.lr = lr
+
+    shared = Encoder(8)
+    table = defaultdict(list, {'enc': shared})
+    model = Model(Pair(shared, Encoder(4)), table=table, lr=0.5)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'model.plan')
+        config = os.path.join(root, 'config.yaml')
+        open(config, 'w').close()
+
+        compile_plan([model], path=path, depends=[config])
+        plan = load_plan(path)
+
+        assert plan is not None, 'the plan is not loaded'
+        assert len(plan) == 3, 'the shared draft is not compiled once'
+
+        (m,) = plan.execute()
+
+        assert isinstance(m.pair, Pair), 'pair is not a namedtuple'
+        assert [e.dim for e in m.pair] == [8, 4], 'the nested drafts are not built'
+        assert isinstance(m.table, defaultdict) and m.table.default_factory is list, \
+                    'table is not a defaultdict'
+        assert m.table['enc'] is m.pair.first, 'the shared draft is built twice'
+        assert m.lr == 0.5, 'lr is changed'
+        assert m.__instancename__ is draft_v2.Draft.default, 'the instance name is not set'
+
+        # touch the source file
+        st = os.stat(config)
+        os.utime(config, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        assert load_plan(path) is None, 'the stale plan is loaded'
+
+        # the module building the drafts
+        script = os.path.join(root, 'make_config.py')
+
+        def load_script(lr):
+            with open(script, 'w') as f:
+                f.write('import __main__\n'
+                        'LR = {}\n'
+                        'def make():\n'
+                        '    return [__main__.Encoder(LR)]\n'.format(lr))
+            # a different size, the mtime may not change
+            namespace = {}
+            exec(compile(open(script).read(), script, 'exec'), namespace)
+            return namespace['make']
+
+        path = os.path.join(root, 'script.plan')
+
+        (e,) = cached_plan(path, load_script(0.1)).execute()
+        assert e.dim == 0.1, 'the script is not compiled'
+
+        (e,) = cached_plan(path, load_script(0.25)).execute()
+        assert e.dim == 0.25, 'the plan is not recompiled after the script changed'
+
+    print('plan: Clear')
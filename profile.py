@@ -0,0 +1,157 @@
+# --- built in ---
+import os
+import sys
+import json
+import time
+import runpy
+import random
+import argparse
+import threading
+
+# --- 3rd party ---
+# --- my module ---
+from . import draft_v2
+
+'''
+Record Draft.instantiate/Draftable.__instantiate__ calls and write them as Chrome trace
+events (chrome://tracing, https://ui.perfetto.dev).
+
+Usage:
+
+    python -m draft.profile [-o trace.json] [--sample-rate RATE] my_config.py [args ...]
+
+Or in code:
+
+>>> with Profiler() as profiler:
+...     draft_a.instantiate()
+>>> profiler.save('trace.json')
+'''
+
+
+__all__ = [
+    'Profiler'
+]
+
+
+class Profiler():
+    '''
+    Profiler
+
+    Record the nesting, thread and duration of each Draft.instantiate and 
+    Draftable.__instantiate__ call. 
+
+    In sampling mode (sample_rate < 1), each outermost call is recorded with probability
+    sample_rate, and the calls nested in it follow the same decision, so the recorded 
+    call trees are always complete.
+
+    Args:
+        sample_rate: (float) probability of recording an outermost call.
+    '''
+    def __init__(self, sample_rate=1.0):
+        assert 0.0 <= sample_rate <= 1.0, 'sample_rate must be in [0, 1]'
+
+        self.sample_rate = sample_rate
+        self.events = []
+        self._local = threading.local()
+        self._threads = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        draft_v2.set_profiler(self)
+
+    def stop(self):
+        if draft_v2.get_profiler() is self:
+            draft_v2.set_profiler(None)
+
+    def begin(self, name, cls, key):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+
+        # outermost call, make sampling decision
+        if depth == 0:
+            local.sampled = (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+        local.depth = depth + 1
+
+        if not local.sampled:
+            return None
+
+        return (name, cls, key, time.perf_counter_ns())
+
+    def end(self, token):
+        end = time.perf_counter_ns()
+        self._local.depth -= 1
+
+        if token is None:
+            return
+
+        name, cls, key, start = token
+        tid = threading.get_ident()
+
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+
+        self.events.append({
+            'name': '{} {}'.format(name, getattr(cls, '__qualname__', cls)),
+            'cat': name,
+            'ph': 'X',
+            'ts': start / 1000.0,
+            'dur': (end - start) / 1000.0,
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': {
+                'class': draft_v2._classname(cls),
+                'key': None if key is None else draft_v2._keystr(key)
+            }
+        })
+
+    def trace(self):
+        '''
+        Return the recorded events in Chrome trace event format
+        '''
+        pid = os.getpid()
+        meta = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 
+                    'args': {'name': name}} for tid, name in self._threads.items()]
+
+        return {
+            'traceEvents': meta + sorted(self.events, key=lambda e: e['ts']),
+            'displayTimeUnit': 'ms'
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m draft.profile',
+                    description='Profile draft instantiation and write a Chrome trace.')
+    parser.add_argument('-o', '--output', default='draft_trace.json', help='output trace file')
+    parser.add_argument('--sample-rate', type=float, default=1.0, 
+                    help='probability of recording an outermost instantiate call')
+    parser.add_argument('script', help='python script to run')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='script arguments')
+    args = parser.parse_args(argv)
+
+    # run the script as __main__
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+
+    profiler = Profiler(sample_rate=args.sample_rate)
+
+    try:
+        with profiler:
+            runpy.run_path(args.script, run_name='__main__')
+    finally:
+        profiler.save(args.output)
+        print('draft.profile: {} events written to {}'.format(len(profiler.events), args.output),
+                file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# --- built in ---
+import os
+import time
+import heapq
+
+from concurrent.futures import ProcessPoolExecutor
+
+# --- 3rd party ---
+# --- my module ---
+from . import draft_v2
+
+'''
+Build many drafts on a process pool, longest first, using the build durations recorded
+by Draft.instantiate (see draft_v2.build_costs).
+'''
+
+
+__all__ = [
+    'build_all',
+    'predict_cost',
+    'predict_makespan'
+]
+
+
+def predict_cost(draft, costs=None):
+    '''
+    Predict the build duration (seconds) of draft from the recorded mean duration of 
+    its wrapped class. Unknown classes are predicted as the mean of all known classes.
+    '''
+    costs = draft_v2.build_costs() if costs is None else costs
+    name = draft_v2._classname(draft.__draftwrappedclass__)
+
+    if name in costs:
+        return costs[name]['mean']
+
+    if costs:
+        return sum(c['mean'] for c in costs.values()) / len(costs)
+
+    return 0.0
+
+def predict_makespan(durations, workers):
+    '''
+    Predict the makespan of running durations in the given order on workers, each 
+    task is taken by the first free worker.
+    '''
+    loads = [0.0] * max(1, min(workers, len(durations)))
+
+    for duration in durations:
+        heapq.heapreplace(loads, loads[0] + duration)
+
+    return max(loads) if durations else 0.0
+
+
+def _cpu_count():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+def _find_shared(draft):
+    '''
+    Find the draft with share_memory() enabled in draft and its nested drafts
+    '''
+    seen = set()
+    stack = [draft]
+
+    while stack:
+        draft = stack.pop()
+
+        if id(draft) in seen:
+            continue
+        seen.add(id(draft))
+
+        if draft.__sharememory__:
+            return draft
+
+        stack.extend(draft_v2._iter_drafts(draft.__draftwrappedparam__))
+
+    return None
+
+def _build(draft, key):
+    '''
+    Build the instance of key in a worker process
+
+    Returns:
+        (tuple) the instance, the build duration and the build costs recorded
+        in this call.
+    '''
+    # only send back the costs recorded in this call
+    draft_v2._take_build_costs()
+
+    start = time.perf_counter()
+    inst = draft.instantiate(key)
+    duration = time.perf_counter() - start
+
+    return inst, duration, draft_v2._take_build_costs()
+
+
+def build_all(drafts, key=draft_v2.Draft.default, workers=None, cost_file=None):
+    '''
+    Instantiate drafts on a process pool, longest predicted build first (LPT), and
+    report the predicted against the actual makespan. The instances are sent back
+    and cached in drafts, and the build durations measured in the workers are
+    recorded (see draft_v2.build_costs).
+
+    Notice that the drafts and their instances must be picklable, and the instances are
+    copied back from the workers, including the large parameters they hold. Drafts with 
+    share_memory() enabled are rejected, since their instances hold views of shared 
+    memory, which can not be sent back. The nested drafts are built in the workers, 
+    their instances are not cached in this process. The drafts which already have an 
+    up-to-date instance of key are not rebuilt.
+
+    Args:
+        drafts: (list of Draft) drafts to instantiate.
+        key: the key of the instances.
+        workers: (int) number of worker processes, default to the number of available
+            CPUs. With more workers than CPUs, the recorded durations include the time
+            waiting for a CPU.
+        cost_file: (str) if given, load the recorded build durations from this file
+            (if exists) before scheduling, and save them back after building.
+
+    Returns:
+        (dict) 'instances': the instances in the order of drafts, 'order': the indices 
+        of drafts in build order, 'predicted': predicted duration per draft,
+        'actual': actual duration per draft, 'predicted_makespan', 'actual_makespan'.
+    '''
+    workers = workers or _cpu_count()
+
+    if cost_file is not None and os.path.exists(cost_file):
+        draft_v2.load_build_costs(cost_file)
+
+    costs = draft_v2.build_costs()
+    predicted = [predict_cost(draft, costs) for draft in drafts]
+    order = sorted(range(len(drafts)), key=lambda i: predicted[i], reverse=True)
+
+    actual = [0.0] * len(drafts)
+
+    # build each draft once
+    pending = {}
+    for i in order:
+        draft = drafts[i]
+        if not draft_v2.is_draft(draft) or id(draft) in pending:
+            continue
+
+        if draft.is_stale(key):
+            draft.remove(key)
+
+        if key not in draft.__instancedict__:
+            pending[id(draft)] = i
+
+    for i in pending.values():
+        shared = _find_shared(drafts[i])
+        if shared is not None:
+            raise RuntimeError(('Can not build {} on a process pool, since {} has share_memory() '
+                        'enabled. Its instances can not be sent back').format(drafts[i], shared))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {i: executor.submit(_build, drafts[i], key) for i in pending.values()}
+
+        for i, future in futures.items():
+            inst, actual[i], costs = future.result()
+            drafts[i].__setinstance__(key, inst)
+            draft_v2._merge_build_costs(costs)
+    makespan = time.perf_counter() - start
+
+    instances = [draft_v2.Instantiate(draft, key) for draft in drafts]
+
+    if cost_file is not None:
+        draft_v2.save_build_costs(cost_file)
+
+    return {
+        'instances': instances,
+        'order': order,
+        'predicted': predicted,
+        'actual': actual,
+        'predicted_makespan': predict_makespan([predicted[i] for i in order], workers),
+        'actual_makespan': makespan
+    }